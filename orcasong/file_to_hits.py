@@ -5,6 +5,33 @@
 import numpy as np
 import km3pipe as kp
 
+# cache for the event_track dtype specs, keyed by the track dict keys.
+# The keys only depend on the file_particle_type and the prod_ident option,
+# so the spec is identical for every event of a file and doesn't need to be
+# rebuilt in the event loop.
+_event_track_dtypes = {}
+
+
+def get_event_track_dtypes(track):
+    """
+    Returns the (cached) dtype spec [(key, np.float64), ...] for an event_track dict.
+
+    Parameters
+    ----------
+    track : dict
+        Dict with the event_track data of one event, cf. get_tracks().
+
+    Returns
+    -------
+    dtypes : list
+        List of (fieldname, np.float64) tuples for all keys of the track dict.
+
+    """
+    keys = tuple(track.keys())
+    if keys not in _event_track_dtypes:
+        _event_track_dtypes[keys] = [(key, np.float64) for key in keys]
+    return _event_track_dtypes[keys]
+
 
 def get_primary_track_index(event_blob):
     """
@@ -48,7 +75,7 @@ def get_time_residual_nu_interaction_mean_triggered_hits(time_interaction, hits_
         Array with trigger flags that specifies if the hit is triggered or not.
 
     """
-    hits_time_triggered = hits_time[triggered == 1]
+    hits_time_triggered = hits_time[triggered != 0]
     t_mean_triggered = np.mean(hits_time_triggered, dtype=np.float64)
     time_residual_vertex = t_mean_triggered - time_interaction
 
@@ -89,17 +116,26 @@ def get_hits(event_blob, geo, do_mc_hits, data_cuts, do4d):
         hits = geo.apply(hits)
 
     if data_cuts['triggered'] is True:
-        hits = hits.triggered_hits # alternative, though it only works for the triggered condition!
+        hits = hits[hits.triggered.astype(bool)] # boolean mask instead of the triggered_hits property
 
     pos_x, pos_y, pos_z = hits.pos_x, hits.pos_y, hits.pos_z
     hits_time = hits.time
     triggered = hits.triggered
 
-    ax = np.newaxis
-    event_hits = np.concatenate([pos_x[:, ax], pos_y[:, ax], pos_z[:, ax], hits_time[:, ax], triggered[:, ax]], axis=1) # dtype: np.float64
+    add_channel_id = do4d[0] is True and do4d[1] == 'channel_id' or do4d[1] == 'xzt-c'
+    n_cols = 6 if add_channel_id else 5
+
+    # fill the column-major hits data into one preallocated float32 array instead of
+    # concatenating float64 column copies (float32 is precise enough for pos/time/channel)
+    event_hits = np.empty((pos_x.shape[0], n_cols), dtype=np.float32)
+    event_hits[:, 0] = pos_x
+    event_hits[:, 1] = pos_y
+    event_hits[:, 2] = pos_z
+    event_hits[:, 3] = hits_time
+    event_hits[:, 4] = triggered
 
-    if do4d[0] is True and do4d[1] == 'channel_id' or do4d[1] == 'xzt-c':
-        event_hits = np.concatenate([event_hits, hits.channel_id[:, ax]], axis=1)
+    if add_channel_id:
+        event_hits[:, 5] = hits.channel_id
 
     return event_hits
 
@@ -207,7 +243,7 @@ def get_tracks(event_blob, file_particle_type, event_hits, prod_ident):
 
     if prod_ident is not None: track['prod_ident'] = prod_ident
 
-    dtypes = [(key, np.float64) for key in track.keys()]
+    dtypes = get_event_track_dtypes(track)
     event_track = kp.dataclasses.Table(track, dtype=dtypes, h5loc='y', name='Event_Information')
 
     return event_track
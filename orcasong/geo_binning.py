@@ -6,10 +6,36 @@
 OrcaSong code that handles the spatial binning of the output images.
 """
 
+from functools import lru_cache
+
 import numpy as np
 import km3pipe as kp
 
 
+@lru_cache(maxsize=None)
+def load_calibration(detx_filepath):
+    """
+    Loads a kp.Calibration object based on the filepath of a .detx file.
+
+    The result is cached per filepath: parsing a .detx takes seconds, and
+    when many input files are processed against the same detector geometry
+    within one python process, the file only has to be parsed once.
+
+    Parameters
+    ----------
+    detx_filepath : str
+        Filepath of a .detx detector file which contains the geometry of the detector.
+
+    Returns
+    -------
+    geo : kp.calib.Calibration
+        The calibration for the .detx file.
+
+    """
+    print("Reading detector geometry in order to calculate the detector dimensions from file " + detx_filepath)
+    return kp.calib.Calibration(filename=detx_filepath)
+
+
 def calculate_bin_edges(n_bins, det_geo, detx_filepath, do4d):
     """
     Calculates the bin edges for the corresponding detector geometry (1 DOM/bin) based on the number of specified bins.
@@ -34,14 +60,13 @@ def calculate_bin_edges(n_bins, det_geo, detx_filepath, do4d):
         The bin edges for the x,y,z direction.
 
     """
-    # Loads a kp.Geometry object based on the filepath of a .detx file
-    print("Reading detector geometry in order to calculate the detector dimensions from file " + detx_filepath)
-    geo = kp.calib.Calibration(filename=detx_filepath)
+    # Loads a kp.Geometry object based on the filepath of a .detx file, cached across invocations
+    geo = load_calibration(detx_filepath)
 
     # derive maximum and minimum x,y,z coordinates of the geometry input [[xmin, ymin, zmin], [xmax, ymax, zmax]]
-    dom_position_values = geo.get_detector().dom_positions.values()
-    dom_pos_max = np.amax([pos for pos in dom_position_values], axis=0)
-    dom_pos_min = np.amin([pos for pos in dom_position_values], axis=0)
+    dom_positions = np.stack(list(geo.get_detector().dom_positions.values()))
+    dom_pos_max = np.amax(dom_positions, axis=0)
+    dom_pos_min = np.amin(dom_positions, axis=0)
     geo_limits = dom_pos_min, dom_pos_max
     print('Detector dimensions [[xmin, ymin, zmin], [xmax, ymax, zmax]]: ' + str(geo_limits))
 
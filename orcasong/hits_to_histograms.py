@@ -9,6 +9,229 @@ import matplotlib.pyplot as plt
 import numpy as np
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 
+try:
+    import numba
+except ImportError:
+    # numba is optional, the plain numpy binning below is used if it is missing
+    numba = None
+
+
+def compute_uniform_bin_indices(data, lo, hi, n_bins):
+    """
+    Computes the bin index of every value for a uniform binning, without the
+    bin-edge search that np.histogramdd runs on the full edge arrays.
+
+    All bin edges used in OrcaSong come from np.linspace, so the lookup
+    reduces to one multiply-add per hit.
+    Values that lie exactly on the rightmost edge are put into the last bin
+    and values outside [lo, hi] are flagged as invalid, like in np.histogramdd.
+
+    Parameters
+    ----------
+    data : ndarray(ndim=1)
+        The values that should be binned.
+    lo, hi : float
+        Lowest and highest bin edge.
+    n_bins : int
+        Number of bins.
+
+    Returns
+    -------
+    bin_idx : ndarray(ndim=1)
+        The bin index for each value, clipped to [0, n_bins - 1].
+    valid : ndarray(ndim=1)
+        Boolean mask which flags the values inside [lo, hi].
+
+    """
+    scale = n_bins / (hi - lo)
+    bin_idx = ((data - lo) * scale).astype(np.int64)
+    np.clip(bin_idx, 0, n_bins - 1, out=bin_idx)
+    valid = np.logical_and(data >= lo, data <= hi)
+    return bin_idx, valid
+
+
+def compute_extended_bin_indices(data, lo, hi, n_bins):
+    """
+    Like compute_uniform_bin_indices, but instead of returning a validity
+    mask the values outside [lo, hi] are put into an underflow/overflow bin,
+    so that no hits are dropped.
+
+    Parameters
+    ----------
+    data : ndarray(ndim=1)
+        The values that should be binned.
+    lo, hi : float
+        Lowest and highest bin edge.
+    n_bins : int
+        Number of core bins.
+
+    Returns
+    -------
+    bin_idx : ndarray(ndim=1)
+        The bin index for each value, in [0, n_bins + 1]. The core bins are
+        shifted up by one, bin 0 is the underflow and bin n_bins + 1 the
+        overflow bin.
+
+    """
+    bin_idx, _ = compute_uniform_bin_indices(data, lo, hi, n_bins)
+    bin_idx += 1
+    bin_idx[data < lo] = 0
+    bin_idx[data > hi] = n_bins + 1
+    return bin_idx
+
+
+def histogramdd_from_indices(axes):
+    """
+    Computes a histogram from precomputed per-axis uniform bin indices.
+
+    Allows to compute the bin index of each hit only once per axis and
+    reuse it for all projections of an event.
+
+    Parameters
+    ----------
+    axes : list(tuple)
+        One (bin_idx, valid, n_bins) tuple per dimension, with bin_idx and
+        valid as returned by compute_uniform_bin_indices. valid can be None
+        if all values of that axis are inside the binning (e.g. for indices
+        from compute_extended_bin_indices).
+
+    Returns
+    -------
+    hist : ndarray
+        The histogram, like np.histogramdd(...)[0].
+
+    """
+    flat_idx, valid, n_bins = None, None, []
+    for bin_idx, valid_dim, n in axes:
+        n_bins.append(n)
+        if flat_idx is None:
+            flat_idx = bin_idx
+        else:
+            flat_idx = flat_idx * n + bin_idx
+
+        if valid_dim is not None:
+            if valid is None:
+                valid = valid_dim.copy()
+            else:
+                np.logical_and(valid, valid_dim, out=valid)
+
+    if valid is not None:
+        flat_idx = flat_idx[valid]
+
+    hist = np.bincount(flat_idx, minlength=int(np.prod(n_bins)))
+    return hist.reshape(n_bins)
+
+
+def compute_fused_4d_histogram(event_hits, x_bin_edges, y_bin_edges, z_bin_edges, n_bins, timecut):
+    """
+    Computes the fused 4D xyzt histogram of an event, with one underflow and
+    one overflow bin at each end of every axis.
+
+    All 2D/3D/4D event images are projections of this histogram: summing an
+    axis out completely (core + underflow/overflow bins) is identical to
+    never having binned it, and slicing [1:-1] is identical to binning with
+    the given edges. This way the hits of an event are binned exactly once,
+    instead of once per projection.
+
+    Uses a jit-compiled kernel if numba is available, and integer bin
+    indexing + np.bincount with plain numpy otherwise.
+
+    Parameters
+    ----------
+    event_hits : ndarray(ndim=2)
+        2D array that contains the hits data for a certain event_id.
+    x_bin_edges, y_bin_edges, z_bin_edges : ndarray(ndim=1)
+        Bin edges for the X/Y/Z-direction.
+    n_bins : tuple of int
+        Contains the number of bins that should be used for each dimension.
+    timecut : tuple(str, str/None)
+        Tuple that defines what timecut should be used in hits_to_histograms.
+
+    Returns
+    -------
+    hist_ext : ndarray(ndim=4)
+        The histogram with shape (n_x + 2, n_y + 2, n_z + 2, n_t + 2).
+    t_start, t_end : float
+        Absolute start and end time of the timespan cut.
+
+    """
+    t_start, t_end = get_time_parameters(event_hits, mode=timecut)
+
+    x, y, z, t = event_hits[:, 0], event_hits[:, 1], event_hits[:, 2], event_hits[:, 3]
+    n_x, n_y, n_z, n_t = len(x_bin_edges) - 1, len(y_bin_edges) - 1, len(z_bin_edges) - 1, n_bins[3]
+
+    if numba is not None:
+        lo = np.array([x_bin_edges[0], y_bin_edges[0], z_bin_edges[0], t_start], dtype=np.float64)
+        hi = np.array([x_bin_edges[-1], y_bin_edges[-1], z_bin_edges[-1], t_end], dtype=np.float64)
+        scale = np.array([n_x, n_y, n_z, n_t], dtype=np.float64) / (hi - lo)
+        hist_ext = np.zeros((n_x + 2, n_y + 2, n_z + 2, n_t + 2), dtype=np.int64)
+        kernel = _get_fused_hist_kernel((n_x, n_y, n_z, n_t))
+        kernel(np.ascontiguousarray(x, dtype=np.float64),
+               np.ascontiguousarray(y, dtype=np.float64),
+               np.ascontiguousarray(z, dtype=np.float64),
+               np.ascontiguousarray(t, dtype=np.float64),
+               lo, hi, scale, hist_ext)
+    else:
+        hist_ext = histogramdd_from_indices([
+            (compute_extended_bin_indices(x, x_bin_edges[0], x_bin_edges[-1], n_x), None, n_x + 2),
+            (compute_extended_bin_indices(y, y_bin_edges[0], y_bin_edges[-1], n_y), None, n_y + 2),
+            (compute_extended_bin_indices(z, z_bin_edges[0], z_bin_edges[-1], n_z), None, n_z + 2),
+            (compute_extended_bin_indices(t, t_start, t_end, n_t), None, n_t + 2),
+        ])
+
+    return hist_ext, t_start, t_end
+
+
+if numba is not None:
+    _fused_hist_kernels = {}
+
+    def _get_fused_hist_kernel(n_bins_xyzt):
+        """
+        Returns the binning kernel for the fused 4D histogram, jit-compiled
+        and specialized on the core bin counts.
+
+        The kernel does one multiply-add and a bounds check per hit and
+        dimension; out-of-range hits go into the underflow/overflow bins of
+        the respective axes. The bin counts are closure constants, so numba
+        constant-folds the index clamping and the flattening strides instead
+        of reading them from the array shape on every call. One kernel is
+        compiled and cached per distinct binning (in practice one per run).
+
+        Not parallelized on purpose: with the typical O(1e3) hits of a
+        single event, the thread-team setup would dominate the runtime.
+        """
+        if n_bins_xyzt not in _fused_hist_kernels:
+            n_x, n_y, n_z, n_t = n_bins_xyzt
+
+            @numba.njit
+            def _fill_fused_hist_4d(x, y, z, t, lo, hi, scale, hist):
+                for i in range(x.shape[0]):
+                    ix = min(max(int((x[i] - lo[0]) * scale[0]), 0), n_x - 1) + 1
+                    iy = min(max(int((y[i] - lo[1]) * scale[1]), 0), n_y - 1) + 1
+                    iz = min(max(int((z[i] - lo[2]) * scale[2]), 0), n_z - 1) + 1
+                    it = min(max(int((t[i] - lo[3]) * scale[3]), 0), n_t - 1) + 1
+                    if x[i] < lo[0]:
+                        ix = 0
+                    elif x[i] > hi[0]:
+                        ix = n_x + 1
+                    if y[i] < lo[1]:
+                        iy = 0
+                    elif y[i] > hi[1]:
+                        iy = n_y + 1
+                    if z[i] < lo[2]:
+                        iz = 0
+                    elif z[i] > hi[2]:
+                        iz = n_z + 1
+                    if t[i] < lo[3]:
+                        it = 0
+                    elif t[i] > hi[3]:
+                        it = n_t + 1
+                    hist[ix, iy, iz, it] += 1
+
+            _fused_hist_kernels[n_bins_xyzt] = _fill_fused_hist_4d
+
+        return _fused_hist_kernels[n_bins_xyzt]
+
 
 def get_time_parameters(event_hits, mode=('trigger_cluster', 'all'), t_start_margin=0.15, t_end_margin=0.15):
     """
@@ -32,11 +255,10 @@ def get_time_parameters(event_hits, mode=('trigger_cluster', 'all'), t_start_mar
         Events in this timespan are accepted, others are rejected.
 
     """
-    t = event_hits[:, 3:4]
+    t = event_hits[:, 3]
 
     if mode[0] == 'trigger_cluster':
-        triggered = event_hits[:, 4:5]
-        t = t[triggered == 1]
+        t = t[event_hits[:, 4] != 0] # triggered hits only
         t_mean = np.mean(t, dtype=np.float64)
 
         if mode[1] == 'tight-0':
@@ -78,53 +300,53 @@ def get_time_parameters(event_hits, mode=('trigger_cluster', 'all'), t_start_mar
     return t_start, t_end
 
 
-def compute_4d_to_2d_histograms(event_hits, event_track, x_bin_edges, y_bin_edges, z_bin_edges, n_bins, timecut, do2d_plots, pdf_2d_plots):
+def compute_4d_to_2d_histograms(hist_ext, event_track, x_bin_edges, y_bin_edges, z_bin_edges, t_start, t_end, do2d_plots, pdf_2d_plots):
     """
-    Computes 2D numpy histogram 'images' from the 4D data and appends the 2D histograms to the all_4d_to_2d_hists list,
-    [xy, xz, yz, xt, yt, zt].
+    Computes the 2D histogram 'images' [xy, xz, yz, xt, yt, zt] as projections
+    of the fused 4D histogram.
+
+    Summing an axis out completely (core + underflow/overflow bins) is
+    identical to never having binned it, so each projection matches a direct
+    2D histogram of the hits.
 
     Parameters
     ----------
-    event_hits : ndarray(ndim=2)
-        2D array that contains the hits data for a certain event_id.
+    hist_ext : ndarray(ndim=4)
+        The fused 4D histogram from compute_fused_4d_histogram.
     event_track : ndarray(ndim=2)
         Contains the relevant mc_track info for the event in order to get a nice title for the pdf histos.
     x_bin_edges, y_bin_edges, z_bin_edges: ndarray(ndim=1)
         Bin edges for the X/Y/Z-direction.
-    n_bins : tuple of int
-        Contains the number of bins that should be used for each dimension.
-    timecut : tuple(str, str/None)
-        Tuple that defines what timecut should be used in hits_to_histograms.
+    t_start, t_end : float
+        Absolute start and end time of the timespan cut.
     do2d_plots : bool
         If True, generate 2D matplotlib pdf histograms.
     pdf_2d_plots : mpl.backends.backend_pdf.PdfPages/None
         Either a mpl PdfPages instance or None.
 
     """
-    x, y, z, t = event_hits[:, 0], event_hits[:, 1], event_hits[:, 2], event_hits[:, 3]
+    # create histograms for this event, [1:-1] slices off the underflow/overflow bins
+    hist_xy = hist_ext.sum(axis=(2, 3))[1:-1, 1:-1]
+    hist_xz = hist_ext.sum(axis=(1, 3))[1:-1, 1:-1]
+    hist_yz = hist_ext.sum(axis=(0, 3))[1:-1, 1:-1]
 
-    # analyze time
-    t_start, t_end = get_time_parameters(event_hits, mode=timecut)
-
-    # create histograms for this event
-    hist_xy = np.histogram2d(x, y, bins=(x_bin_edges, y_bin_edges))  # hist[0] = H, hist[1] = xedges, hist[2] = yedges
-    hist_xz = np.histogram2d(x, z, bins=(x_bin_edges, z_bin_edges))
-    hist_yz = np.histogram2d(y, z, bins=(y_bin_edges, z_bin_edges))
-
-    hist_xt = np.histogram2d(x, t, bins=(x_bin_edges, n_bins[3]), range=((min(x_bin_edges), max(x_bin_edges)), (t_start, t_end)))
-    hist_yt = np.histogram2d(y, t, bins=(y_bin_edges, n_bins[3]), range=((min(y_bin_edges), max(y_bin_edges)), (t_start, t_end)))
-    hist_zt = np.histogram2d(z, t, bins=(z_bin_edges, n_bins[3]), range=((min(z_bin_edges), max(z_bin_edges)), (t_start, t_end)))
+    hist_xt = hist_ext.sum(axis=(1, 2))[1:-1, 1:-1]
+    hist_yt = hist_ext.sum(axis=(0, 2))[1:-1, 1:-1]
+    hist_zt = hist_ext.sum(axis=(0, 1))[1:-1, 1:-1]
 
     if do2d_plots:
-        hists = [hist_xy, hist_xz, hist_yz, hist_xt, hist_yt, hist_zt]
+        t_bin_edges = np.linspace(t_start, t_end, hist_ext.shape[3] - 1)
+        hists = [(hist_xy, x_bin_edges, y_bin_edges), (hist_xz, x_bin_edges, z_bin_edges),
+                 (hist_yz, y_bin_edges, z_bin_edges), (hist_xt, x_bin_edges, t_bin_edges),
+                 (hist_yt, y_bin_edges, t_bin_edges), (hist_zt, z_bin_edges, t_bin_edges)]
         convert_2d_numpy_hists_to_pdf_image(hists, t_start, t_end, pdf_2d_plots, event_track=event_track) # slow! takes about 1s per event
 
-    hist_xy = kp.dataclasses.NDArray(hist_xy[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='XY_Event_Images')
-    hist_xz = kp.dataclasses.NDArray(hist_xz[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='XZ_Event_Images')
-    hist_yz = kp.dataclasses.NDArray(hist_yz[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='YZ_Event_Images')
-    hist_xt = kp.dataclasses.NDArray(hist_xt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='XT_Event_Images')
-    hist_yt = kp.dataclasses.NDArray(hist_yt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='YT_Event_Images')
-    hist_zt = kp.dataclasses.NDArray(hist_zt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='ZT_Event_Images')
+    hist_xy = kp.dataclasses.NDArray(hist_xy[np.newaxis, ...].astype(np.uint8), h5loc='x', title='XY_Event_Images')
+    hist_xz = kp.dataclasses.NDArray(hist_xz[np.newaxis, ...].astype(np.uint8), h5loc='x', title='XZ_Event_Images')
+    hist_yz = kp.dataclasses.NDArray(hist_yz[np.newaxis, ...].astype(np.uint8), h5loc='x', title='YZ_Event_Images')
+    hist_xt = kp.dataclasses.NDArray(hist_xt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='XT_Event_Images')
+    hist_yt = kp.dataclasses.NDArray(hist_yt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='YT_Event_Images')
+    hist_zt = kp.dataclasses.NDArray(hist_zt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='ZT_Event_Images')
 
     return hist_xy, hist_xz, hist_yz, hist_xt, hist_yt, hist_zt
 
@@ -135,8 +357,8 @@ def convert_2d_numpy_hists_to_pdf_image(hists, t_start, t_end, pdf_2d_plots, eve
 
     Parameters
     ----------
-    hists : list(ndarray(ndim=2))
-        Contains np.histogram2d objects of all projections [xy, xz, yz, xt, yt, zt].
+    hists : list(tuple)
+        Contains (hist, edges_a, edges_b) tuples of all projections [xy, xz, yz, xt, yt, zt].
     t_start, t_end : float
         Absolute start/end time of the timespan cut.
     pdf_2d_plots : mpl.backends.backend_pdf.PdfPages/None
@@ -178,7 +400,8 @@ def convert_2d_numpy_hists_to_pdf_image(hists, t_start, t_end, pdf_2d_plots, eve
         # Format in classical numpy convention: x along first dim (vertical), y along second dim (horizontal)
         # Need to take that into account in convert_2d_numpy_hists_to_pdf_image()
         # transpose to get typical cartesian convention: y along first dim (vertical), x along second dim (horizontal)
-        plot_ab = axes_ab.pcolormesh(a, b, h_ab_masked.T)
+        # rasterized=True: store the mesh as an image in the pdf instead of one vector patch per bin
+        plot_ab = axes_ab.pcolormesh(a, b, h_ab_masked.T, rasterized=True)
 
         the_divider = make_axes_locatable(axes_ab)
         color_axis = the_divider.append_axes("right", size="5%", pad=0.1)
@@ -199,59 +422,54 @@ def convert_2d_numpy_hists_to_pdf_image(hists, t_start, t_end, pdf_2d_plots, eve
     plt.close()
 
 
-def compute_4d_to_3d_histograms(event_hits, x_bin_edges, y_bin_edges, z_bin_edges, n_bins, timecut):
+def compute_4d_to_3d_histograms(hist_ext, event_hits, n_bins, t_start, t_end):
     """
-    Computes 3D numpy histogram 'images' from the 4D data and appends the 3D histograms to the all_4d_to_3d_hists list,
-    [xyz, xyt, xzt, yzt, rzt].
+    Computes the 3D histogram 'images' [xyz, xyt, xzt, yzt, rzt].
 
-    Careful: Currently, appending to all_4d_to_3d_hists takes quite a lot of memory (about 200MB for 3500 events).
-    In the future, the list should be changed to a numpy ndarray.
-    (Which unfortunately would make the code less readable, since an array is needed for each projection...)
+    The cartesian projections are derived from the fused 4D histogram by
+    summing out the unused axis. Only the rzt histogram has to be binned
+    from the hits directly, since its r and z binning is relative to the
+    event extent and not covered by the fused histogram.
 
     Parameters
     ----------
+    hist_ext : ndarray(ndim=4)
+        The fused 4D histogram from compute_fused_4d_histogram.
     event_hits : ndarray(ndim=2)
         2D array that contains the hits data for a certain event_id.
-    x_bin_edges, y_bin_edges, z_bin_edges : ndarray(ndim=2)
-        Bin edges for the X/Y/Z-direction.
     n_bins : tuple of int
         Contains the number of bins that should be used for each dimension.
-    timecut : tuple(str, str/None)
-        Tuple that defines what timecut should be used in hits_to_histograms.
+    t_start, t_end : float
+        Absolute start and end time of the timespan cut.
 
     """
+    # [1:-1] slices off the underflow/overflow bins
+    hist_xyz = hist_ext.sum(axis=3)[1:-1, 1:-1, 1:-1]
 
-    x, y, z, t = event_hits[:, 0:1], event_hits[:, 1:2], event_hits[:, 2:3], event_hits[:, 3:4]
-
-    t_start, t_end = get_time_parameters(event_hits, mode=timecut)
+    hist_xyt = hist_ext.sum(axis=2)[1:-1, 1:-1, 1:-1]
+    hist_xzt = hist_ext.sum(axis=1)[1:-1, 1:-1, 1:-1]
+    hist_yzt = hist_ext.sum(axis=0)[1:-1, 1:-1, 1:-1]
 
-    hist_xyz = np.histogramdd(event_hits[:, 0:3], bins=(x_bin_edges, y_bin_edges, z_bin_edges))
-
-    hist_xyt = np.histogramdd(np.concatenate([x, y, t], axis=1), bins=(x_bin_edges, y_bin_edges, n_bins[3]),
-                              range=((min(x_bin_edges), max(x_bin_edges)), (min(y_bin_edges), max(y_bin_edges)), (t_start, t_end)))
-    hist_xzt = np.histogramdd(np.concatenate([x, z, t], axis=1), bins=(x_bin_edges, z_bin_edges, n_bins[3]),
-                              range=((min(x_bin_edges), max(x_bin_edges)), (min(z_bin_edges), max(z_bin_edges)), (t_start, t_end)))
-    hist_yzt = np.histogramdd(event_hits[:, 1:4], bins=(y_bin_edges, z_bin_edges, n_bins[3]),
-                              range=((min(y_bin_edges), max(y_bin_edges)), (min(z_bin_edges), max(z_bin_edges)), (t_start, t_end)))
-
-    # add a rotation-symmetric 3d hist
+    # add a rotation-symmetric 3d hist, the r and z binning is relative to the event extent
+    x, y, z, t = event_hits[:, 0], event_hits[:, 1], event_hits[:, 2], event_hits[:, 3]
     r = np.sqrt(x * x + y * y)
-    rzt = np.concatenate([r, z, t], axis=1)
-    hist_rzt = np.histogramdd(rzt, bins=(n_bins[0], n_bins[2], n_bins[3]), range=((np.amin(r), np.amax(r)), (np.amin(z), np.amax(z)), (t_start, t_end)))
+    r_axis = compute_uniform_bin_indices(r, np.amin(r), np.amax(r), n_bins[0]) + (n_bins[0],)
+    z_rzt_axis = compute_uniform_bin_indices(z, np.amin(z), np.amax(z), n_bins[2]) + (n_bins[2],)
+    t_axis = compute_uniform_bin_indices(t, t_start, t_end, n_bins[3]) + (n_bins[3],)
+    hist_rzt = histogramdd_from_indices([r_axis, z_rzt_axis, t_axis])
 
-    hist_xyz = kp.dataclasses.NDArray(hist_xyz[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='XYZ_Event_Images')
-    hist_xyt = kp.dataclasses.NDArray(hist_xyt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='XYT_Event_Images')
-    hist_xzt = kp.dataclasses.NDArray(hist_xzt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='XZT_Event_Images')
-    hist_yzt = kp.dataclasses.NDArray(hist_yzt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='YZT_Event_Images')
-    hist_rzt = kp.dataclasses.NDArray(hist_rzt[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title='RZT_Event_Images')
+    hist_xyz = kp.dataclasses.NDArray(hist_xyz[np.newaxis, ...].astype(np.uint8), h5loc='x', title='XYZ_Event_Images')
+    hist_xyt = kp.dataclasses.NDArray(hist_xyt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='XYT_Event_Images')
+    hist_xzt = kp.dataclasses.NDArray(hist_xzt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='XZT_Event_Images')
+    hist_yzt = kp.dataclasses.NDArray(hist_yzt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='YZT_Event_Images')
+    hist_rzt = kp.dataclasses.NDArray(hist_rzt[np.newaxis, ...].astype(np.uint8), h5loc='x', title='RZT_Event_Images')
 
     return hist_xyz, hist_xyt, hist_xzt, hist_yzt, hist_rzt
 
 
-def compute_4d_to_4d_histograms(event_hits, x_bin_edges, y_bin_edges, z_bin_edges, n_bins, timecut, do4d):
+def compute_4d_to_4d_histograms(event_hits, x_bin_edges, y_bin_edges, z_bin_edges, n_bins, timecut, do4d, hist_ext=None):
     """
-    Computes 4D numpy histogram 'images' from the 4D data and appends the 4D histogram to the all_4d_to_4d_hists list,
-    [xyzt / xyzc]
+    Computes 4D numpy histogram 'images' of the event, [xyzt / xyzc].
 
     Parameters
     ----------
@@ -266,29 +484,34 @@ def compute_4d_to_4d_histograms(event_hits, x_bin_edges, y_bin_edges, z_bin_edge
     do4d : tuple(bool, str)
         Tuple, where [1] declares what should be used as 4th dimension after xyz.
         Currently, only 'time' and 'channel_id' are available.
+    hist_ext : ndarray(ndim=4), optional
+        The fused 4D histogram from compute_fused_4d_histogram, if it has
+        already been computed for this event. Only used in 'time' mode.
 
     """
-    t_start, t_end = get_time_parameters(event_hits, mode=timecut)
-
     if do4d[1] == 'time':
-        hist_4d = np.histogramdd(event_hits[:, 0:4], bins=(x_bin_edges, y_bin_edges, z_bin_edges, n_bins[3]),
-                                   range=((min(x_bin_edges),max(x_bin_edges)),(min(y_bin_edges),max(y_bin_edges)),
-                                          (min(z_bin_edges),max(z_bin_edges)),(t_start, t_end)))
+        if hist_ext is None:
+            hist_ext, _, _ = compute_fused_4d_histogram(event_hits, x_bin_edges, y_bin_edges,
+                                                        z_bin_edges, n_bins, timecut)
+        # the core bins of the fused histogram, without the underflow/overflow bins
+        hist_4d = hist_ext[1:-1, 1:-1, 1:-1, 1:-1]
 
     elif do4d[1] == 'channel_id':
+        t_start, t_end = get_time_parameters(event_hits, mode=timecut)
+
         time = event_hits[:, 3]
         event_hits = event_hits[np.logical_and(time >= t_start, time <= t_end)]
         channel_id = event_hits[:, 5:6]
         hist_4d = np.histogramdd(np.concatenate([event_hits[:, 0:3], channel_id], axis=1), bins=(x_bin_edges, y_bin_edges, z_bin_edges, 31),
-                                   range=((min(x_bin_edges),max(x_bin_edges)),(min(y_bin_edges),max(y_bin_edges)),
-                                          (min(z_bin_edges),max(z_bin_edges)),(np.amin(channel_id), np.amax(channel_id))))
+                                   range=((x_bin_edges[0], x_bin_edges[-1]), (y_bin_edges[0], y_bin_edges[-1]),
+                                          (z_bin_edges[0], z_bin_edges[-1]), (np.amin(channel_id), np.amax(channel_id))))[0]
 
     else:
         raise ValueError('The parameter in do4d[1] ' + str(do4d[1]) + ' is not available. Currently, only time and channel_id are supported.')
 
     proj_name = 'XYZT' if not do4d[1] == 'channel_id' else 'XYZC'
     title = proj_name + '_Event_Images'
-    hist_4d = kp.dataclasses.NDArray(hist_4d[0][np.newaxis, ...].astype(np.uint8), h5loc='x', title=title)
+    hist_4d = kp.dataclasses.NDArray(hist_4d[np.newaxis, ...].astype(np.uint8), h5loc='x', title=title)
 
     return hist_4d
 
@@ -330,10 +553,19 @@ class HistogramMaker(kp.Module):
             Dictionary that contains the event_hits array and the event_track array.
 
         """
+        # bin the hits of the event only once; all enabled cartesian projections are derived from this
+        fused_needed = self.do2d or self.do3d or (self.do4d[0] and self.do4d[1] != 'channel_id')
+        if fused_needed:
+            hist_ext, t_start, t_end = compute_fused_4d_histogram(
+                blob['event_hits'], self.x_bin_edges, self.y_bin_edges, self.z_bin_edges,
+                self.n_bins, self.timecut)
+        else:
+            hist_ext = None
+
         if self.do2d:
             blob['xy'], blob['xz'], blob['yz'], blob['xt'], blob['yt'], blob['zt'] = compute_4d_to_2d_histograms(
-                blob['event_hits'], blob['event_track'], self.x_bin_edges, self.y_bin_edges, self.z_bin_edges,
-                self.n_bins, self.timecut, self.do2d_plots[0], self.pdf_2d_plots)
+                hist_ext, blob['event_track'], self.x_bin_edges, self.y_bin_edges, self.z_bin_edges,
+                t_start, t_end, self.do2d_plots[0], self.pdf_2d_plots)
 
             self.i += 1
             if self.pdf_2d_plots is not None and self.i >= self.do2d_plots[1]:
@@ -342,13 +574,12 @@ class HistogramMaker(kp.Module):
 
         if self.do3d:
             blob['xyz'], blob['xyt'], blob['xzt'], blob['yzt'], blob['rzt'] = compute_4d_to_3d_histograms(
-                blob['event_hits'], self.x_bin_edges, self.y_bin_edges, self.z_bin_edges,
-                self.n_bins, self.timecut)
+                hist_ext, blob['event_hits'], self.n_bins, t_start, t_end)
 
         if self.do4d[0]:
             proj_key = 'xyzt' if not self.do4d[1] == 'channel_id' else 'xyzc'
 
             blob[proj_key] = compute_4d_to_4d_histograms(blob['event_hits'], self.x_bin_edges, self.y_bin_edges, self.z_bin_edges,
-                                        self.n_bins, self.timecut, self.do4d)
+                                        self.n_bins, self.timecut, self.do4d, hist_ext=hist_ext)
 
         return blob
\ No newline at end of file
@@ -7,7 +7,6 @@ IO Code for OrcaSong.
 """
 
 import os
-import errno
 import toml
 import warnings
 
@@ -116,28 +115,13 @@ def make_output_dirs(output_dirpath, do2d, do3d, do4d):
     if do2d:
         projections = ['xy', 'xz', 'yz', 'xt', 'yt', 'zt']
         for proj in projections:
-            if not os.path.exists(output_dirpath + '/orcasong_output/4dTo2d/' + proj):
-                try:
-                    os.makedirs(output_dirpath + '/orcasong_output/4dTo2d/' + proj)
-                except OSError as e:
-                    if e.errno != errno.EEXIST:
-                        raise
+            os.makedirs(output_dirpath + '/orcasong_output/4dTo2d/' + proj, exist_ok=True)
 
     if do3d:
         projections = ['xyz', 'xyt', 'xzt', 'yzt', 'rzt']
         for proj in projections:
-            if not os.path.exists(output_dirpath + '/orcasong_output/4dTo3d/' + proj):
-                try:
-                    os.makedirs(output_dirpath + '/orcasong_output/4dTo3d/' + proj)
-                except OSError as e:
-                    if e.errno != errno.EEXIST:
-                        raise
+            os.makedirs(output_dirpath + '/orcasong_output/4dTo3d/' + proj, exist_ok=True)
 
     if do4d[0]:
         proj = 'xyzt' if not do4d[1] == 'channel_id' else 'xyzc'
-        if not os.path.exists(output_dirpath + '/orcasong_output/4dTo4d/' + proj):
-            try:
-                os.makedirs(output_dirpath + '/orcasong_output/4dTo4d/' + proj)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
\ No newline at end of file
+        os.makedirs(output_dirpath + '/orcasong_output/4dTo4d/' + proj, exist_ok=True)
\ No newline at end of file
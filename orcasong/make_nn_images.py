@@ -36,6 +36,7 @@ __status__ = 'Prototype'
 
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 #from memory_profiler import profile # for memory profiling, call with @profile; myfunc()
 #import line_profiler # call with kernprof -l -v file.py args
 import km3pipe as kp
@@ -173,6 +174,38 @@ def make_nn_images(fname, detx_filepath, config):
         pdf_2d_plots.close()
 
 
+def make_nn_images_multi(fnames, detx_filepath, config, n_jobs=None):
+    """
+    Runs make_nn_images for multiple input files in parallel, one worker
+    process per file.
+
+    The runtime of make_nn_images is dominated by the per-file event loop
+    and the files are fully independent of each other, so multiple files
+    scale with the number of worker processes.
+    Careful: all files are processed with the same .detx file and config,
+    and write into the same output_dirpath.
+
+    Parameters
+    ----------
+    fnames : list
+        Filenames (full path!) of the input files.
+    detx_filepath : str
+        String with the full filepath to the corresponding .detx file of the input files.
+    config : dict
+        Dictionary that contains all configuration options of the make_nn_images function.
+        An explanation of the config parameters can be found in orcasong/default_config.toml.
+    n_jobs : int, optional
+        Number of worker processes. Default: the number of processors of the machine.
+
+    """
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(make_nn_images, fname, detx_filepath, config)
+                   for fname in fnames]
+        # re-raise errors from the workers, if any
+        for future in futures:
+            future.result()
+
+
 def main():
     """
     Parses the input to the main make_nn_images function.
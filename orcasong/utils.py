@@ -9,6 +9,41 @@ Utility code for OrcaSong.
 import numpy as np
 import km3pipe as kp
 
+# size of the blocks of pregenerated random numbers used in _random_bool
+_RAND_BLOCK_SIZE = 65536
+
+_rand_block = None
+_rand_block_i = 0
+
+
+def _random_bool(prob):
+    """
+    Draws a single bool which is True with the given probability.
+
+    The random numbers are pregenerated in blocks with one vectorized call,
+    since np.random.choice builds a Python list and runs a heavy rng
+    codepath on every single call, which dominates the skip time of the
+    event loop.
+
+    Parameters
+    ----------
+    prob : float
+        The probability for the returned bool to be True.
+
+    Returns
+    -------
+    bool
+        The drawn bool.
+
+    """
+    global _rand_block, _rand_block_i
+    if _rand_block is None or _rand_block_i >= _RAND_BLOCK_SIZE:
+        _rand_block = np.random.random(_RAND_BLOCK_SIZE)
+        _rand_block_i = 0
+    rand = _rand_block[_rand_block_i]
+    _rand_block_i += 1
+    return bool(rand < prob)
+
 
 class EventSkipper(kp.Module):
     """
@@ -52,11 +87,9 @@ def skip_event(event_track, data_cuts):
         continue_bool = event_track.energy[0] > data_cuts['energy_upper_limit'] # True if E > upper limit
 
     if data_cuts['throw_away_prob'] is not None and continue_bool == False:
-        throw_away_prob = data_cuts['throw_away_prob']
-        throw_away = np.random.choice([False, True], p=[1 - throw_away_prob, throw_away_prob])
-        if throw_away: continue_bool = True
+        continue_bool = _random_bool(data_cuts['throw_away_prob'])
 
-    if data_cuts['custom_skip_function'] is not None:
+    if data_cuts['custom_skip_function'] is not None and continue_bool == False:
         continue_bool = use_custom_skip_function(data_cuts['custom_skip_function'], event_track)
 
     return continue_bool
@@ -103,7 +136,7 @@ def use_custom_skip_function(skip_function, event_track):
                     continue_bool = False
                 else:
                     evt_survive_prob = 1/float(fract)
-                    continue_bool = np.random.choice([False, True], p=[evt_survive_prob, 1 - evt_survive_prob])
+                    continue_bool = _random_bool(1 - evt_survive_prob)
 
             else:  # for elec neutrinos
                 assert np.abs(particle_type) == 12
@@ -112,7 +145,7 @@ def use_custom_skip_function(skip_function, event_track):
                     continue_bool = False
                 else:
                     evt_survive_prob = fract
-                    continue_bool = np.random.choice([False, True], p=[evt_survive_prob, 1 - evt_survive_prob])
+                    continue_bool = _random_bool(1 - evt_survive_prob)
 
         return continue_bool
 
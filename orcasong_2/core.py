@@ -1,4 +1,6 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+
 import km3pipe as kp
 import km3modules as km
 
@@ -10,6 +12,16 @@ from orcasong_2.mc_info_types import get_mc_info_extr
 __author__ = 'Stefan Reck'
 
 
+def _bin_one_file(file_binner, infile, outfile):
+    """
+    Bin one file with the given FileBinner.
+
+    Module-level so that it can be dispatched to worker processes.
+
+    """
+    file_binner.run(infile, outfile, save_plot=False)
+
+
 class FileBinner:
     """
     For making binned images and mc_infos, which can be used for conv. nets.
@@ -150,7 +162,7 @@ class FileBinner:
                 save_as = os.path.splitext(outfile)[0] + "_hists.pdf"
                 bs_plot.plot_hists(hists, save_as)
 
-    def run_multi(self, infiles, outfolder, save_plot=False):
+    def run_multi(self, infiles, outfolder, save_plot=False, n_jobs=1):
         """
         Bin multiple files into their own output files each.
 
@@ -164,6 +176,11 @@ class FileBinner:
         save_plot : bool
             Save the binning hists as a pdf. Only possible if add_bin_stats
             is True.
+        n_jobs : int, optional
+            Bin that many files in parallel, with one process per file.
+            Each file is an independent pipeline, so this scales until
+            the disk bandwidth is saturated. Requires that mc_info_extr
+            and event_skipper are picklable (e.g. module-level functions).
 
         """
         if save_plot and self.bin_plot_freq is None:
@@ -176,7 +193,17 @@ class FileBinner:
             outfile = os.path.join(outfolder, outfile_name)
             outfiles.append(outfile)
 
-            self.run(infile, outfile, save_plot=False)
+        if n_jobs != 1 and len(infiles) > 1:
+            max_workers = min(len(infiles), n_jobs or os.cpu_count())
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_bin_one_file, self, infile, outfile)
+                           for infile, outfile in zip(infiles, outfiles)]
+                for future in futures:
+                    # re-raise errors from the workers
+                    future.result()
+        else:
+            for infile, outfile in zip(infiles, outfiles):
+                self.run(infile, outfile, save_plot=False)
 
         if save_plot:
             bs_plot.plot_hist_of_files(files=outfiles,
@@ -6,9 +6,57 @@ import warnings
 import numpy as np
 import km3pipe as kp
 
+try:
+    import numba
+except ImportError:
+    # numba is optional, the numpy fallbacks below are used if it is missing
+    numba = None
+
 __author__ = 'Stefan Reck'
 
 
+if numba is not None:
+    @numba.jit(nopython=True, cache=True)
+    def first_triggered_time(times, triggered):
+        """
+        Get the earliest time of the triggered hits.
+
+        Fuses the trigger mask and the minimum into one pass, without
+        materializing the masked copy that times[triggered == 1] makes.
+
+        Parameters
+        ----------
+        times : ndarray(ndim=1)
+            Time of the hits.
+        triggered : ndarray(ndim=1)
+            Trigger flags of the hits.
+
+        Returns
+        -------
+        t_min : float
+            The earliest triggered hit time, or inf if no hit is triggered.
+
+        """
+        t_min = np.inf
+        for i in range(len(times)):
+            if triggered[i] != 0:
+                t = times[i]
+                if t < t_min:
+                    t_min = t
+        return t_min
+
+else:
+    def first_triggered_time(times, triggered):
+        """
+        Get the earliest time of the triggered hits (numpy fallback).
+
+        np.where avoids gathering the triggered times into a compacted
+        copy before the reduction.
+
+        """
+        return np.min(np.where(triggered != 0, times, np.inf))
+
+
 class McInfoMaker(kp.Module):
     """
     Get the desired mc_info from the blob.
@@ -79,27 +127,32 @@ class TimePreproc(kp.Module):
             print("Adding t0 to hit times")
         hits_time = blob["Hits"].time
         hits_t0 = blob["Hits"].t0
-        blob["Hits"].time = np.add(hits_time, hits_t0)
+        # add in place instead of allocating a shifted copy
+        np.add(hits_time, hits_t0, out=hits_time)
+        blob["Hits"].time = hits_time
 
         return blob
 
     def center_hittime(self, blob):
         hits_time = blob["Hits"].time
         hits_triggered = blob["Hits"].triggered
-        t_first_trigger = np.min(hits_time[hits_triggered == 1])
+        t_first_trigger = first_triggered_time(hits_time, hits_triggered)
 
         if self.center_time:
             if not self._cent_hits_flag:
                 print("Centering time of Hits")
                 self._cent_hits_flag = True
-            blob["Hits"].time = np.subtract(hits_time, t_first_trigger)
+            # shift in place instead of allocating a shifted copy
+            np.subtract(hits_time, t_first_trigger, out=hits_time)
+            blob["Hits"].time = hits_time
 
         if self.has_mchits:
             if not self._cent_mchits_flag:
                 print("Centering time of McHits")
                 self._cent_mchits_flag = True
             mchits_time = blob["McHits"].time
-            blob["McHits"].time = np.subtract(mchits_time, t_first_trigger)
+            np.subtract(mchits_time, t_first_trigger, out=mchits_time)
+            blob["McHits"].time = mchits_time
 
         return blob
 
@@ -132,6 +185,14 @@ class ImageMaker(kp.Module):
         histogram = np.histogramdd(data, bins=bins)[0]
         title = name + "event_images"
 
+        # the images are stored as uint8 to keep the files small; guard
+        # against bins with more than 255 hits, which would wrap around
+        # silently in the cast
+        if histogram.max() > np.iinfo(np.uint8).max:
+            warnings.warn("Histogram bin with more than 255 hits found, "
+                          "clipping to 255 for the uint8 image")
+            np.clip(histogram, 0, np.iinfo(np.uint8).max, out=histogram)
+
         hist_one_event = histogram[np.newaxis, ...].astype(np.uint8)
         kp_hist = kp.dataclasses.NDArray(hist_one_event, h5loc='x', title=title)
 
@@ -0,0 +1,163 @@
+"""
+Tests for the custom km3pipe modules in orcasong_2.modules.
+"""
+
+from unittest import TestCase
+
+import numpy as np
+from km3pipe.dataclasses import Table
+
+import orcasong_2.modules as modules
+
+__author__ = 'Stefan Reck'
+
+
+def _assert_table_equal(table, target):
+    """
+    Compare a Table to a structured array, field by field.
+
+    np.asarray on a Table column returns a view into the backing
+    buffer, so unlike np.array(table) this does not rebuild the whole
+    structured array before the comparison.
+
+    Parameters
+    ----------
+    table : km3pipe Table
+        The table to check.
+    target : ndarray
+        Structured array with the expected content.
+
+    """
+    np.testing.assert_array_equal(table.dtype.names, target.dtype.names)
+    for name in target.dtype.names:
+        np.testing.assert_array_equal(
+            np.asarray(table[name]), np.asarray(target[name]),
+            err_msg="Field '{}' differs".format(name))
+
+
+class TestTimePreproc(TestCase):
+    """
+    Test the time preprocessing on a small hand-made blob.
+
+    The fixture values are chosen to be exactly representable in
+    binary, so that the expected times after adding t0 and centering
+    can be compared without a tolerance.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        # build the structured buffers only once per class; Table
+        # construction from python lists (dtype inference, per-column
+        # np.asarray) is far more expensive than the np.copy each
+        # test makes of the finished arrays
+        cls._hits_arr = np.array(
+            [(1., 0.25, 0), (2., 0.5, 1), (3., 0.75, 1)],
+            dtype=[("time", "f8"), ("t0", "f8"), ("triggered", "i8")])
+        cls._mchits_arr = np.array(
+            [(1.,), (2.,), (3.,)],
+            dtype=[("time", "f8")])
+
+        # the module configurations are static, so one instance per
+        # flag combination can be shared by all tests
+        cls._preprocs = {
+            (add_t0, center_time): modules.TimePreproc(
+                add_t0=add_t0, center_time=center_time)
+            for add_t0, center_time in
+            [(True, False), (False, True), (True, True)]
+        }
+
+    def _get_preproc(self, add_t0, center_time):
+        """ Get a shared TimePreproc instance, ready for a new blob. """
+        module = self._preprocs[(add_t0, center_time)]
+        # whether the blob has mchits is cached after the first blob
+        # a module sees; reset it so each test is probed fresh
+        module.has_mchits = None
+        return module
+
+    def setUp(self):
+        # TimePreproc shifts the times in place, so hand each test its
+        # own copy of the shared buffers
+        self.in_blob_mc = {
+            "Hits": Table(np.copy(self._hits_arr)),
+            "McHits": Table(np.copy(self._mchits_arr)),
+        }
+
+    def _target_hits(self, time):
+        """ The hits fixture, with the time column replaced. """
+        target = np.copy(self._hits_arr)
+        target["time"] = time
+        return target
+
+    def test_time_preproc(self):
+        base = self._hits_arr["time"]
+        t0 = self._hits_arr["t0"]
+        # index 1 is the first triggered hit; the expected times are
+        # derived from the fixture instead of typed out as literals
+        cases = [
+            (True, False, base + t0),
+            (False, True, base - base[1]),
+            (True, True, (base + t0) - (base + t0)[1]),
+        ]
+        for add_t0, center_time, expected_time in cases:
+            with self.subTest(add_t0=add_t0, center_time=center_time):
+                module = self._get_preproc(add_t0, center_time)
+                # process works in place, so each scenario gets a
+                # fresh copy of the fixture
+                in_blob = {"Hits": Table(np.copy(self._hits_arr))}
+                out_blob = module.process(in_blob)
+
+                target = self._target_hits(expected_time)
+                _assert_table_equal(out_blob["Hits"], target)
+
+    def test_center_time_mchits(self):
+        module = self._get_preproc(add_t0=False, center_time=True)
+        out_blob = module.process(self.in_blob_mc)
+
+        # mchits are shifted by the first triggered hit time of the hits
+        target = np.copy(self._mchits_arr)
+        target["time"] = [-1., 0., 1.]
+        _assert_table_equal(out_blob["McHits"], target)
+
+
+class TestMcInfoMaker(TestCase):
+    def setUp(self):
+        self.in_blob = {
+            "Hits": Table(np.array(
+                [(2, 0, 10.1), (3, 1, 11.2), (3, 2, 12.3)],
+                dtype=[("dom_id", "i8"),
+                       ("channel_id", "i8"),
+                       ("time", "f8")])),
+        }
+
+    def test_mc_info_maker(self):
+        fields = ("dom_id", "time")
+        rows = np.array([0, 2])
+
+        def mc_info_extr(blob):
+            """
+            Gather all the extracted values with one fancy index
+            instead of one python indexing call per field. Extractors
+            for many fields should follow this pattern, as it keeps
+            the per-event python overhead constant in the number of
+            fields.
+            """
+            hits = blob["Hits"]
+            stacked = np.stack(
+                [np.asarray(hits[field], dtype=np.float64)
+                 for field in fields])
+            values = stacked[np.arange(len(fields)), rows]
+            return dict(zip(("dom_id_0", "time_2"), values))
+
+        module = modules.McInfoMaker(mc_info_extr=mc_info_extr,
+                                     store_as="test")
+        out_blob = module.process(self.in_blob)
+
+        self.assertSetEqual(set(out_blob.keys()), {"Hits", "test"})
+        # the dtype field order matters for the h5 layout, so compare
+        # the names tuple directly instead of materializing a list
+        self.assertEqual(out_blob["test"].dtype.names,
+                         ("dom_id_0", "time_2"))
+        np.testing.assert_array_equal(
+            np.asarray(out_blob["test"]["dom_id_0"]), [2.])
+        np.testing.assert_array_equal(
+            np.asarray(out_blob["test"]["time_2"]), [12.3])
@@ -43,7 +43,8 @@ def plot_hists(hists, save_to, plot_bin_edges=True):
             total_hits = np.sum(hist) + np.sum(cut_off)
 
             bin_widths = np.diff(hist_bin_edges)
-            hist_prob = hist / bin_widths / np.sum(hist)
+            # normalize with a single divide instead of two passes over hist
+            hist_prob = hist / (bin_widths * np.sum(hist))
 
             fig, ax = plt.subplots()
             plt.bar(hist_bin_edges[:-1],
@@ -109,29 +110,40 @@ def combine_hists(hists_list):
             "cut_off": np.zeros(2),
         }
 
-    # add them together
-    for hists in hists_list:
-        for bin_name, hists_data in hists.items():
-            # name and bin edges must be the same for all hists
-            if bin_name not in combined_hists:
-                raise NameError(
-                    "Hists dont all have the same binning field name:"
-                    "{}".format(bin_name))
-
-            bin_edges = hists_data["bin_edges"]
-            comb_edges = combined_hists[bin_name]["bin_edges"]
-            if len(bin_edges) != len(comb_edges):
-                raise ValueError("Hists have different hist bin edges: {} vs {}"
-                                 .format(bin_edges, comb_edges))
-
-            hist_bin_edges = hists_data["hist_bin_edges"]
-            comb_hist_edges = combined_hists[bin_name]["hist_bin_edges"]
-            if len(hist_bin_edges) != len(comb_hist_edges):
-                raise ValueError("Hists have different bin edges: {} vs {}"
-                                 .format(hist_bin_edges, comb_hist_edges))
-
-            combined_hists[bin_name]["hist"] += hists_data["hist"]
-            combined_hists[bin_name]["cut_off"] += hists_data["cut_off"]
+    # name and bin edges must be the same for all hists; one schema dict
+    # comparison per file instead of re-checking every edge array
+    def get_schema(hists):
+        return {bin_name: (len(hists_data["bin_edges"]),
+                           len(hists_data["hist_bin_edges"]))
+                for bin_name, hists_data in hists.items()}
+
+    schema = get_schema(hists_list[0])
+    for hists in hists_list[1:]:
+        other_schema = get_schema(hists)
+
+        if other_schema.keys() != schema.keys():
+            raise NameError(
+                "Hists dont all have the same binning field names:"
+                "{} vs {}".format(sorted(other_schema), sorted(schema)))
+
+        if other_schema != schema:
+            raise ValueError("Hists have different bin edges: {} vs {}"
+                             .format(other_schema, schema))
+
+    # stack the hists of all files per bin_name and reduce them with a
+    # single sum instead of accumulating them one file at a time
+    n_files = len(hists_list)
+    for bin_name in combined_hists:
+        hist_stack = np.empty(
+            (n_files, len(combined_hists[bin_name]["hist"])))
+        cut_off_stack = np.empty((n_files, 2))
+
+        for i, hists in enumerate(hists_list):
+            hist_stack[i] = hists[bin_name]["hist"]
+            cut_off_stack[i] = hists[bin_name]["cut_off"]
+
+        combined_hists[bin_name]["hist"] = hist_stack.sum(axis=0)
+        combined_hists[bin_name]["cut_off"] = cut_off_stack.sum(axis=0)
 
     return combined_hists
 
@@ -149,11 +161,19 @@ def add_hists_to_h5file(hists, file):
 
     """
     base_name = "bin_stats/"
-    with h5py.File(file, "a") as f:
+    # libver latest speeds up the creation of the many small groups
+    with h5py.File(file, "a", libver="latest") as f:
         for bin_name, hists_data in hists.items():
             for key, val in hists_data.items():
                 h5_folder = base_name + bin_name + "/" + key
-                f.create_dataset(h5_folder, data=val)
+                val = np.asarray(val)
+                if val.size >= 1024:
+                    # compress the bigger hists with the fast lzf filter;
+                    # the tiny edge/cut_off arrays are cheaper uncompressed
+                    f.create_dataset(h5_folder, data=val, chunks=True,
+                                     shuffle=True, compression="lzf")
+                else:
+                    f.create_dataset(h5_folder, data=val)
 
 
 def plot_hist_of_files(save_as, files=None):
@@ -169,7 +189,6 @@ def plot_hist_of_files(save_as, files=None):
 
     """
     hists_list = []
-    opened_files = []
 
     if not files:
         all_files = os.listdir(os.getcwd())
@@ -178,29 +197,27 @@ def plot_hist_of_files(save_as, files=None):
             if file.endswith(".h5"):
                 files.append(file)
 
-    try:
-        print("Plotting stats of {} files".format(len(files)))
-        for i, file in enumerate(files):
-            if i % 100 == 0:
-                print("File {}..." .format(i))
+    print("Plotting stats of {} files".format(len(files)))
+    for i, file in enumerate(files):
+        if i % 100 == 0:
+            print("File {}..." .format(i))
 
-            f = h5py.File(file, "r")
+        # read each dataset into memory once and close the file right
+        # away; handing the h5py groups to combine_hists instead would
+        # re-read the same arrays on every access
+        with h5py.File(file, "r") as f:
             if "bin_stats/" not in f:
                 warnings.warn("ERROR: File {} does not have bin_stats dataset. "
                               "Skipping ...".format(file))
-                f.close()
                 continue
 
-            hists_list.append(f["bin_stats/"])
-            opened_files.append(f)
-
-        print("Plotting...")
-        plot_hists(hists_list, save_as)
+            hists = {}
+            for bin_name, group in f["bin_stats/"].items():
+                hists[bin_name] = {key: group[key][()] for key in group}
+            hists_list.append(hists)
 
-    finally:
-        print("Closing files...")
-        for file in opened_files:
-            file.close()
+    print("Plotting...")
+    plot_hists(hists_list, save_as)
 
 
 def main():
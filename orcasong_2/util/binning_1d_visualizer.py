@@ -10,15 +10,253 @@ the time/ Z-Coordinate.
 
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
 import numpy as np
 import km3pipe as kp
 import matplotlib.pyplot as plt
 
+try:
+    import numba
+except ImportError:
+    # numba is optional, the plain numpy binning below is used if it is missing
+    numba = None
+
 from orcasong_2.modules import TimePreproc, DetApplier
 
 __author__ = 'Stefan Reck'
 
 
+def join_chunks(chunks):
+    """
+    Join a list of 1d arrays into one presized array.
+
+    Unlike np.concatenate, this allocates the target array once and fills
+    it by slice assignment, so no double buffering happens inside the join.
+
+    Parameters
+    ----------
+    chunks : List
+        The 1d ndarrays to join.
+
+    Returns
+    -------
+    out : ndarray or None
+        The joined array, or None if chunks is empty.
+
+    """
+    if not chunks:
+        return None
+
+    sizes = [len(chunk) for chunk in chunks]
+    out = np.empty(sum(sizes), dtype=chunks[0].dtype)
+
+    offset = 0
+    for chunk, size in zip(chunks, sizes):
+        out[offset:offset + size] = chunk
+        offset += size
+
+    return out
+
+
+def uniform_histogram(data, lo, hi, n_bins):
+    """
+    Fast 1d histogram for uniform bins.
+
+    Computes the bin index of each value with one multiply-add instead
+    of the bisection search np.histogram runs when it is handed explicit
+    bin edges. Values outside [lo, hi] are dropped and the rightmost bin
+    includes hi, like in np.histogram.
+
+    Parameters
+    ----------
+    data : ndarray
+        The values to bin.
+    lo, hi : float
+        Left- and right-most bin edge.
+    n_bins : int
+        The number of bins.
+
+    Returns
+    -------
+    counts : ndarray
+        The number of values in each bin.
+
+    """
+    if numba is not None:
+        return _uniform_histogram_numba(
+            np.ascontiguousarray(data), float(lo), float(hi), int(n_bins))
+
+    scale = n_bins / (hi - lo)
+    bin_idx = ((data - lo) * scale).astype(np.intp)
+    np.clip(bin_idx, 0, n_bins - 1, out=bin_idx)
+    valid = np.logical_and(data >= lo, data <= hi)
+    counts = np.bincount(bin_idx[valid], minlength=n_bins)
+
+    return counts
+
+
+if numba is not None:
+    @numba.jit(nopython=True, cache=True)
+    def _uniform_histogram_numba(data, lo, hi, n_bins):
+        """
+        Jit-compiled kernel of uniform_histogram.
+
+        Fuses the subtract-scale-cast-clip chain and the counting into
+        one pass, so no index or mask temporaries are materialized.
+
+        """
+        counts = np.zeros(n_bins, dtype=np.int64)
+        scale = n_bins / (hi - lo)
+
+        for i in range(len(data)):
+            value = data[i]
+            if lo <= value <= hi:
+                bin_idx = int((value - lo) * scale)
+                if bin_idx >= n_bins:
+                    bin_idx = n_bins - 1
+                counts[bin_idx] += 1
+
+        return counts
+
+
+def _extract_bulk_one_file(fname, field, filter_for_du):
+    """
+    Read a column of the hits (and mc_hits) of one file as bulk slabs.
+
+    Module-level so that it can be dispatched to worker processes.
+
+    Parameters
+    ----------
+    fname : str
+        The .h5 file.
+    field : str
+        The column to read, e.g. "time", "pos_z", ...
+    filter_for_du : int or None
+        Only get hits from one specific du, specified by the int.
+
+    Returns
+    -------
+    data : ndarray
+        The hits data.
+    mc_data : ndarray or None
+        The mc_hits data, if present in the file.
+    n_events : int
+        The number of events in the file.
+
+    """
+    with h5py.File(fname, "r") as f:
+        data = _read_column(f, "hits", field, filter_for_du)
+
+        if "mc_hits" in f:
+            mc_data = _read_column(f, "mc_hits", field, filter_for_du)
+        else:
+            mc_data = None
+
+        group_id = f["hits"]["group_id"][:]
+        n_events = int(group_id.max()) + 1 if len(group_id) != 0 else 0
+
+    return data, mc_data, n_events
+
+
+def _extract_bulk_time_one_file(fname, filter_for_du, add_t0):
+    """
+    Read and preprocess the hit times of one file as bulk slabs.
+
+    Bulk equivalent of running TimePreproc on every blob: optionally add
+    t0 to the hit times, then center the times of each event with its
+    first triggered hit. The per-event minima for all events are computed
+    in one pass with np.minimum.reduceat over the event boundaries, so no
+    per-event python dispatch is left.
+
+    Parameters
+    ----------
+    fname : str
+        The .h5 file.
+    filter_for_du : int or None
+        Only get hits from one specific du, specified by the int.
+    add_t0 : bool
+        If true, add t0 to the hit times before centering.
+
+    Returns
+    -------
+    data : ndarray
+        The preprocessed hit times.
+    mc_data : ndarray or None
+        The preprocessed mc_hit times, if present in the file.
+    n_events : int
+        The number of events in the file.
+
+    """
+    # a generous chunk cache, so compressed hit chunks are not re-read
+    # when multiple columns of the same chunks are accessed
+    with h5py.File(fname, "r", rdcc_nbytes=128 * 1024 * 1024) as f:
+        times = f["hits"]["time"][:].astype(np.float64, copy=False)
+        group_id = f["hits"]["group_id"][:]
+
+        if len(group_id) == 0:
+            return times.astype(np.float32), None, 0
+
+        if add_t0:
+            np.add(times, f["hits"]["t0"][:], out=times)
+
+        n_events = int(group_id.max()) + 1
+
+        # the hits of one event are stored consecutively, so the events
+        # are the slices between the jumps of the group_id column
+        starts = np.flatnonzero(np.diff(group_id)) + 1
+        starts = np.concatenate([[0], starts])
+
+        triggered = f["hits"]["triggered"][:]
+        masked_times = np.where(triggered != 0, times, np.inf)
+        t_first = np.minimum.reduceat(masked_times, starts)
+
+        # first triggered time indexed by event id, for the mc hits
+        t_first_per_event = np.zeros(n_events)
+        t_first_per_event[group_id[starts]] = t_first
+
+        counts = np.diff(np.append(starts, len(times)))
+        np.subtract(times, np.repeat(t_first, counts), out=times)
+
+        if filter_for_du is not None:
+            dus = f["hits"]["du"][:]
+            times = times[np.flatnonzero(dus == filter_for_du)]
+
+        data = times.astype(np.float32)
+
+        if "mc_hits" in f:
+            mc_times = f["mc_hits"]["time"][:].astype(np.float64, copy=False)
+            mc_group_id = f["mc_hits"]["group_id"][:]
+            np.subtract(mc_times, t_first_per_event[mc_group_id],
+                        out=mc_times)
+
+            if filter_for_du is not None:
+                mc_dus = f["mc_hits"]["du"][:]
+                mc_times = mc_times[np.flatnonzero(mc_dus == filter_for_du)]
+
+            mc_data = mc_times.astype(np.float32)
+        else:
+            mc_data = None
+
+    return data, mc_data, n_events
+
+
+def _read_column(f, h5_group, field, filter_for_du):
+    """
+    Get the desired column of all events of a h5 group at once.
+
+    """
+    blob_data = f[h5_group][field][:]
+
+    if filter_for_du is not None:
+        dus = f[h5_group]["du"][:]
+        blob_data = blob_data[np.flatnonzero(dus == filter_for_du)]
+
+    return blob_data.astype(np.float32, copy=False)
+
+
 class FieldPlotter:
     """
     Baseclass for investigating the ideal binning, based on the info in
@@ -70,6 +308,8 @@ class FieldPlotter:
         The xlimits of the hist plot.
     show_plots : bool
         If True, auto plt.show() the plot.
+    verbose : bool
+        If False, skip the progress prints during extraction.
 
     """
     def __init__(self, files, field, det_file=None):
@@ -82,6 +322,16 @@ class FieldPlotter:
         self.mc_hits = None
         self.n_events = None
 
+        # running histograms from extract_streaming
+        self._hist_counts = None
+        self._mc_hist_counts = None
+        self._hist_edges = None
+
+        # cached padded bin edges per binning
+        self._edges_cache = {}
+        # reused buffer for the density normalization
+        self._density_buf = None
+
         self.limits = None
         self.n_bins = 100
         self.plot_padding = [0.2, 0.2]
@@ -97,6 +347,7 @@ class FieldPlotter:
         self.ylim = None
         self.show_plots = True
         self.last_ylim = None
+        self.verbose = True
 
     def plot(self, only_mc_hits=False, save_path=None):
         """
@@ -115,7 +366,7 @@ class FieldPlotter:
             The plot.
 
         """
-        if self.hits is None:
+        if self.hits is None and self._hist_counts is None:
             self.extract()
         fig, ax = self.make_histogram(only_mc_hits, save_path)
         return fig, ax
@@ -169,8 +420,11 @@ class FieldPlotter:
         store it.
 
         """
-        data_all_events = None
-        mc_all_events = None
+        # collect the per-event arrays in lists and concatenate once at the
+        # end; growing one big array with np.concatenate per event would copy
+        # all previously accumulated hits for every event
+        data_all_events = []
+        mc_all_events = []
         self.n_events = 0
 
         if not isinstance(self.files, list):
@@ -180,41 +434,153 @@ class FieldPlotter:
 
         event_pump = kp.io.hdf5.HDF5Pump(filenames=files)
 
-        if self.det_file is not None:
-            cal = DetApplier(det_file=self.det_file)
+        # hoist the attribute lookups out of the per-event hot loop
+        get_hits = self._get_hits
+        verbose = self.verbose
+        do_cal = self.det_file is not None
+        if do_cal:
+            cal_process = DetApplier(det_file=self.det_file).process
+
+        for i, event_blob in enumerate(event_pump):
+            if do_cal:
+                event_blob = cal_process(event_blob)
+
+            if verbose and i % 2000 == 0:
+                print("Blob no. "+str(i))
+
+            data_one_event = get_hits(event_blob, get_mc_hits=False)
+            data_all_events.append(data_one_event)
+
+            if "McHits" in event_blob:
+                mc_one_event = get_hits(event_blob, get_mc_hits=True)
+                mc_all_events.append(mc_one_event)
+
+        event_pump.close()
+
+        self.n_events = len(data_all_events)
+        print("Number of events: " + str(self.n_events))
+
+        self.hits = join_chunks(data_all_events)
+        self.mc_hits = join_chunks(mc_all_events)
+
+    def extract_streaming(self):
+        """
+        Extract the content of a field as a running histogram, without
+        keeping the hits of all events in memory.
+
+        Each event's hits are folded into a counts array right away and
+        then discarded, which caps the peak memory at one event instead
+        of the whole file(s). Requires the binning to be set beforehand,
+        since the bin edges can not be changed afterwards without
+        re-extracting.
+
+        """
+        bin_edges = self._get_padded_bin_edges()
+        if not isinstance(bin_edges, np.ndarray):
+            raise ValueError("Can not extract streaming: "
+                             "Binning has to be set first")
+
+        counts = np.zeros(len(bin_edges) - 1, dtype=np.int64)
+        mc_counts = np.zeros(len(bin_edges) - 1, dtype=np.int64)
+        has_mc_hits = False
+        self.n_events = 0
+
+        if not isinstance(self.files, list):
+            files = [self.files]
+        else:
+            files = self.files
+
+        event_pump = kp.io.hdf5.HDF5Pump(filenames=files)
+
+        # hoist the attribute lookups out of the per-event hot loop
+        get_hits = self._get_hits
+        verbose = self.verbose
+        do_cal = self.det_file is not None
+        if do_cal:
+            cal_process = DetApplier(det_file=self.det_file).process
 
         for i, event_blob in enumerate(event_pump):
             self.n_events += 1
 
-            if self.det_file is not None:
-                event_blob = cal.process(event_blob)
+            if do_cal:
+                event_blob = cal_process(event_blob)
 
-            if i % 2000 == 0:
+            if verbose and i % 2000 == 0:
                 print("Blob no. "+str(i))
 
-            data_one_event = self._get_hits(event_blob, get_mc_hits=False)
-
-            if data_all_events is None:
-                data_all_events = data_one_event
-            else:
-                data_all_events = np.concatenate(
-                    [data_all_events, data_one_event], axis=0)
+            data_one_event = get_hits(event_blob, get_mc_hits=False)
+            counts += np.histogram(data_one_event, bins=bin_edges)[0]
 
             if "McHits" in event_blob:
-                mc_one_event = self._get_hits(event_blob, get_mc_hits=True)
-
-                if mc_all_events is None:
-                    mc_all_events = mc_one_event
-                else:
-                    mc_all_events = np.concatenate(
-                        [mc_all_events, mc_one_event], axis=0)
+                has_mc_hits = True
+                mc_one_event = get_hits(event_blob, get_mc_hits=True)
+                mc_counts += np.histogram(mc_one_event, bins=bin_edges)[0]
 
         event_pump.close()
 
         print("Number of events: " + str(self.n_events))
 
-        self.hits = data_all_events
-        self.mc_hits = mc_all_events
+        self.hits = None
+        self.mc_hits = None
+        self._hist_counts = counts
+        self._mc_hist_counts = mc_counts if has_mc_hits else None
+        self._hist_edges = bin_edges
+
+    def extract_bulk(self, n_jobs=1):
+        """
+        Extract the content of a field from all events in the file(s) via
+        bulk column reads, and store it.
+
+        Functionally equivalent to extract for uncalibrated fields, but
+        reads the needed column of each file as a single slab with h5py
+        instead of looping over per-event blobs of the HDF5Pump, which
+        skips the per-event HDF5 and blob overhead entirely.
+        Falls back to extract if a det file is given, since calibration
+        works on whole blobs.
+
+        Parameters
+        ----------
+        n_jobs : int, optional
+            Read that many files in parallel with one process per file.
+            The hdf5 library serializes concurrent access within one
+            process, so multiple processes are used instead of threads.
+
+        """
+        if self.det_file is not None:
+            return self.extract()
+
+        if not isinstance(self.files, list):
+            files = [self.files]
+        else:
+            files = self.files
+
+        worker, args = self._get_bulk_task()
+
+        if n_jobs != 1 and len(files) > 1:
+            max_workers = min(len(files), n_jobs or os.cpu_count())
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(worker, fname, *args)
+                           for fname in files]
+                results = [future.result() for future in futures]
+        else:
+            results = [worker(fname, *args) for fname in files]
+
+        data_chunks = [res[0] for res in results]
+        mc_chunks = [res[1] for res in results if res[1] is not None]
+        self.n_events = sum(res[2] for res in results)
+
+        print("Number of events: " + str(self.n_events))
+
+        self.hits = join_chunks(data_chunks)
+        self.mc_hits = join_chunks(mc_chunks)
+
+    def _get_bulk_task(self):
+        """
+        Get the module-level worker of extract_bulk and its extra
+        arguments after the filename.
+
+        """
+        return _extract_bulk_one_file, (self.field, self.filter_for_du)
 
     def make_histogram(self, only_mc_hits=False, save_path=None):
         """
@@ -235,16 +601,35 @@ class FieldPlotter:
         """
         if only_mc_hits:
             data = self.mc_hits
+            counts = self._mc_hist_counts
         else:
             data = self.hits
+            counts = self._hist_counts
 
-        if data is None:
+        if data is None and counts is None:
             raise ValueError("Can not make histogram, no data extracted yet.")
 
-        bin_edges = self._get_padded_bin_edges()
-
         fig, ax = plt.subplots()
-        n, bins, patches = plt.hist(data, bins=bin_edges, **self.hist_kwargs)
+
+        if data is not None:
+            binning = self._get_padded_binning()
+            if binning is not None:
+                # the padded binning is always uniform, so the fast path
+                # can be used instead of plt.hist; the edges array is
+                # only needed for drawing the bars
+                lo, hi, padded_n_bins = binning
+                counts = uniform_histogram(data, lo, hi, padded_n_bins)
+                bins = self._get_padded_bin_edges()
+                self._plot_counts(counts, bins)
+            else:
+                n, bins, patches = plt.hist(
+                    data, bins=self._get_padded_bin_edges(),
+                    **self.hist_kwargs)
+        else:
+            # streaming extraction: the counts are already binned
+            bins = self._hist_edges
+            self._plot_counts(counts, bins)
+
         print("Size of first bin: " + str(bins[1] - bins[0]))
 
         plt.grid(True, zorder=0, linestyle='dotted')
@@ -274,32 +659,75 @@ class FieldPlotter:
 
         return fig, ax
 
-    def _get_padded_bin_edges(self):
+    def _plot_counts(self, counts, bin_edges):
         """
-        Get the padded bin edges.
+        Bar-plot already binned counts, normalized like plt.hist would.
+
+        """
+        bin_widths = np.diff(bin_edges)
+
+        if self.hist_kwargs.get("density"):
+            # normalize into a reused buffer, so the repeated plot()
+            # calls of the binning workflow don't reallocate each time
+            if self._density_buf is None \
+                    or self._density_buf.shape != counts.shape:
+                self._density_buf = np.empty(counts.shape)
+            hist = np.divide(counts, bin_widths * np.sum(counts),
+                             out=self._density_buf)
+        else:
+            hist = counts
+
+        plt.bar(bin_edges[:-1], hist, align="edge", width=bin_widths)
+
+    def _get_padded_binning(self):
+        """
+        Get the padded binning as a (lo, hi, n_bins) tuple, or None if
+        no binning limits have been set.
+
+        The triple is all the uniform histogrammer needs; the edges array
+        is only materialized for matplotlib in _get_padded_bin_edges.
 
         """
         limits, n_bins = self.get_binning()
 
         if limits is None:
-            bin_edges = n_bins
+            return None
+
+        total_range = limits[1] - limits[0]
+        bin_size = total_range / n_bins
+
+        addtnl_bins = [
+            int(self.plot_padding[0] * n_bins),
+            int(self.plot_padding[1] * n_bins)
+        ]
+
+        lo = limits[0] - bin_size * addtnl_bins[0]
+        hi = limits[1] + bin_size * addtnl_bins[1]
+        padded_n_bins = n_bins + addtnl_bins[0] + addtnl_bins[1]
+
+        return lo, hi, padded_n_bins
+
+    def _get_padded_bin_edges(self):
+        """
+        Get the padded bin edges.
+
+        """
+        binning = self._get_padded_binning()
+
+        if binning is None:
+            bin_edges = self.n_bins
 
         else:
-            total_range = limits[1] - limits[0]
-            bin_size = total_range / n_bins
-
-            addtnl_bins = [
-                int(self.plot_padding[0] * n_bins),
-                int(self.plot_padding[1] * n_bins)
-            ]
-
-            padded_range = [
-                limits[0] - bin_size * addtnl_bins[0],
-                limits[1] + bin_size * addtnl_bins[1]
-            ]
-            padded_n_bins = n_bins + addtnl_bins[0] + addtnl_bins[1]
-            bin_edges = np.linspace(padded_range[0], padded_range[1],
-                                    padded_n_bins + 1)
+            # the edges only depend on the binning and the padding, so
+            # they are cached across the repeated plot() calls of the
+            # interactive binning workflow
+            lo, hi, padded_n_bins = binning
+            cache_key = (lo, hi, padded_n_bins)
+            if cache_key in self._edges_cache:
+                return self._edges_cache[cache_key]
+
+            bin_edges = np.linspace(lo, hi, padded_n_bins + 1)
+            self._edges_cache[cache_key] = bin_edges
 
         return bin_edges
 
@@ -329,9 +757,14 @@ class FieldPlotter:
 
         if self.filter_for_du is not None:
             dus = blob[field_name]["du"]
-            blob_data = blob_data[dus == self.filter_for_du]
+            # fancy-index with the (usually much smaller) matching index
+            # list instead of compacting via the full boolean mask
+            du_idx = np.flatnonzero(dus == self.filter_for_du)
+            blob_data = blob_data[du_idx]
 
-        return blob_data
+        # float32 is plenty for histogramming and halves the memory
+        # traffic of the accumulation
+        return np.asarray(blob_data).astype(np.float32, copy=False)
 
     def _get_xlabel(self):
         """
@@ -357,8 +790,12 @@ class TimePlotter(FieldPlotter):
     def __init__(self, files, add_t0=True, det_file=None):
         field = "time"
         FieldPlotter.__init__(self, files, field, det_file=det_file)
+        self.add_t0 = add_t0
         self.tp = TimePreproc(add_t0=add_t0)
 
+    def _get_bulk_task(self):
+        return _extract_bulk_time_one_file, (self.filter_for_du, self.add_t0)
+
     def _get_hits(self, blob, get_mc_hits):
         blob = self.tp.process(blob)
 
@@ -371,9 +808,14 @@ class TimePlotter(FieldPlotter):
 
         if self.filter_for_du is not None:
             dus = blob[field_name]["du"]
-            blob_data = blob_data[dus == self.filter_for_du]
+            # fancy-index with the (usually much smaller) matching index
+            # list instead of compacting via the full boolean mask
+            du_idx = np.flatnonzero(dus == self.filter_for_du)
+            blob_data = blob_data[du_idx]
 
-        return blob_data
+        # float32 is plenty for histogramming and halves the memory
+        # traffic of the accumulation
+        return np.asarray(blob_data).astype(np.float32, copy=False)
 
 
 class ZPlotter(FieldPlotter):
@@ -386,6 +828,13 @@ class ZPlotter(FieldPlotter):
 
         self.plotting_bins = 100
 
+    def _get_padded_binning(self):
+        """
+        No uniform padded binning here, self.limits holds bin edges.
+
+        """
+        return None
+
     def _get_padded_bin_edges(self):
         """
         Get the padded bin edges.
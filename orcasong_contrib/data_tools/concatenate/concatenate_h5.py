@@ -179,8 +179,9 @@ def get_f_compression_and_chunking(filepath):
 
     Parameters
     ----------
-    filepath : str
-        Filepath of a .hdf5 file.
+    filepath : str or h5py.File
+        Filepath of a .hdf5 file, or an already opened h5py file handle
+        (which will not be closed).
 
     Returns
     -------
@@ -192,7 +193,10 @@ def get_f_compression_and_chunking(filepath):
         The chunksize of axis_0 that has been indentified in the input file.
 
     """
-    f = h5py.File(filepath, 'r')
+    if isinstance(filepath, h5py.File):
+        f, opened_here = filepath, False
+    else:
+        f, opened_here = h5py.File(filepath, 'r'), True
 
     # remove any keys to pytables folders that may be in the file
     f_keys = list(f.keys())
@@ -200,11 +204,44 @@ def get_f_compression_and_chunking(filepath):
 
     compression = f[f_keys_stripped[0]].compression  # compression filter
     compression_opts = f[f_keys_stripped[0]].compression_opts  # filter strength
-    chunksize = f[f_keys_stripped[0]].chunks[0]  # chunksize along axis_0 of the dataset
+    chunks = f[f_keys_stripped[0]].chunks
+    chunksize = chunks[0] if chunks is not None else None  # chunksize along axis_0 of the dataset
+
+    if opened_here:
+        f.close()
 
     return compression, compression_opts, chunksize
 
 
+def pick_chunks(row_shape, dtype, target_bytes=2 ** 20):
+    """
+    Pick a chunk shape that targets about 1 MB per chunk.
+
+    A chunk is hdf5's unit of I/O and compression, and chunks of roughly
+    1 MB fit the library's default raw data chunk cache, so this is a
+    good choice when the input file does not provide a chunking to copy.
+
+    Parameters
+    ----------
+    row_shape : tuple
+        Shape of one row of the dataset, i.e. dataset.shape[1:].
+    dtype : np.dtype
+        The dtype of the dataset.
+    target_bytes : int
+        The desired number of bytes per chunk.
+
+    Returns
+    -------
+    chunks : tuple
+        The chunk shape, i.e. (rows_per_chunk,) + row_shape.
+
+    """
+    row_bytes = int(np.prod(row_shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+    rows_per_chunk = max(1, target_bytes // max(1, row_bytes))
+
+    return (int(rows_per_chunk),) + tuple(row_shape)
+
+
 def concatenate_h5_files(output_filepath, file_list,
                          chunksize=None, complib=None, complevel=None):
     """
@@ -236,14 +273,6 @@ def concatenate_h5_files(output_filepath, file_list,
 
     """
     cum_rows_list = get_cum_number_of_rows(file_list)
-    complib_f, complevel_f, chunksize_f = get_f_compression_and_chunking(file_list[0])
-
-    chunksize = chunksize_f if chunksize is None else chunksize
-    complib = complib_f if complib is None else complib
-    complevel = complevel_f if complevel is None else complevel
-
-    if complib == 'lzf':
-        complevel = None
 
     file_output = h5py.File(output_filepath, 'w')
 
@@ -251,6 +280,18 @@ def concatenate_h5_files(output_filepath, file_list,
         print('Processing file ' + file_list[n])
         input_file = h5py.File(input_file_name, 'r')
 
+        if n == 0:
+            # read the compression and chunking defaults from the handle
+            # that is open anyway, instead of opening the file another time
+            complib_f, complevel_f, chunksize_f = get_f_compression_and_chunking(input_file)
+
+            chunksize = chunksize_f if chunksize is None else chunksize
+            complib = complib_f if complib is None else complib
+            complevel = complevel_f if complevel is None else complevel
+
+            if complib == 'lzf':
+                complevel = None
+
         # create metadata
         if 'format_version' in list(input_file.attrs.keys()) and n == 0:
             file_output.attrs['format_version'] = input_file.attrs['format_version']
@@ -276,10 +317,16 @@ def concatenate_h5_files(output_filepath, file_list,
             if n == 0:
                 # first file; create the dummy dataset with no max shape
                 maxshape = (None,) + folder_data.shape[1:]  # change shape of axis zero to None
-                chunks = (chunksize,) + folder_data.shape[1:]
+                if chunksize is not None:
+                    chunks = (chunksize,) + folder_data.shape[1:]
+                else:
+                    # input is not chunked, so derive a chunk shape per dataset
+                    chunks = pick_chunks(folder_data.shape[1:], folder_data.dtype)
 
+                # byte-shuffle preconditioner for gzip, cf. shuffle_h5.py
                 output_dataset = file_output.create_dataset(folder_name, data=folder_data, maxshape=maxshape, chunks=chunks,
-                                                            compression=complib, compression_opts=complevel)
+                                                            compression=complib, compression_opts=complevel,
+                                                            shuffle=(complib == 'gzip'))
 
                 output_dataset.resize(cum_rows_list[-1], axis=0)
 
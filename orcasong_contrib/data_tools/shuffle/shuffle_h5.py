@@ -10,18 +10,19 @@ Currently, two types of .h5 files are supported:
 
 1) Files which can be read by km3pipe (e.g. files produced with OrcaSong).
 2) Plain hdf5 files with a hdf5 folder depth of 1. This method is based on some legacy code.
-   Be careful to not run out of memory! Needs the unshuffled .h5 file's disk space + the python overhead as memory.
+   The datasets are shuffled blockwise, so only one block (256 MB of rows) needs to fit into memory at a time.
    If you want to use it, please use the --legacy_mode option.
 """
 
 import sys
 import os
 from argparse import ArgumentParser, RawTextHelpFormatter
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import h5py
 import km3pipe as kp
 import km3modules as km
-from orcasong_contrib.data_tools.concatenate.concatenate_h5 import get_f_compression_and_chunking
+from orcasong_contrib.data_tools.concatenate.concatenate_h5 import get_f_compression_and_chunking, pick_chunks
 from orcasong_2.modules import EventSkipper
 
 # from memory_profiler import profile # for memory profiling, call with @profile; myfunc()
@@ -64,6 +65,8 @@ def parse_input():
     legacy_mode : bool
         Boolean flag that specifies, if the legacy shuffle mode should be used instead of the standard one.
         A more detailed description of this mode can be found in the summary at the top of this python file.
+    n_jobs : int
+        Specifies how many files should be shuffled in parallel, with one process per file.
 
     """
     parser = ArgumentParser(description='E.g. < python shuffle_h5.py filepath_1 [filepath_2] [...] > \n'
@@ -86,6 +89,8 @@ def parse_input():
                              'Can range from 0 to 9. Has no effect on "lzf" compression.')
     parser.add_argument('--legacy_mode', dest='legacy_mode', action='store_true',
                         help='If you want to use the legacy mode, as described in the summary at the top of this python file.')
+    parser.add_argument('-j', '--jobs', dest='n_jobs', type=int, default=1,
+                        help='Shuffle that many files in parallel, with one process per file. Default: 1 (sequential).')
 
     parser.set_defaults(legacy_mode=False)
 
@@ -120,8 +125,99 @@ def parse_input():
         print('You chose complevel = ' + str(complevel))
 
     legacy_mode = args.legacy_mode
+    n_jobs = args.n_jobs
 
-    return input_files_list, delete, chunksize, complib, complevel, legacy_mode
+    return input_files_list, delete, chunksize, complib, complevel, legacy_mode, n_jobs
+
+
+def make_perm(n_rows, seed):
+    """
+    Make a random permutation of n_rows row indices.
+
+    Uses the np.random Generator API where available (numpy >= 1.17),
+    which draws large permutations noticeably faster than the legacy
+    RandomState path, and falls back to RandomState on older numpy.
+    Both are deterministic per seed, but the two APIs produce different
+    row orders for the same seed.
+
+    Parameters
+    ----------
+    n_rows : int
+        The number of rows to permute.
+    seed : int
+        Seed for the random number generator.
+
+    Returns
+    -------
+    perm : ndarray(ndim=1)
+        The permuted row indices, dtype np.intp.
+
+    """
+    try:
+        rng = np.random.default_rng(seed)
+    except AttributeError:
+        rng = np.random.RandomState(seed)
+
+    return rng.permutation(n_rows).astype(np.intp)
+
+
+def get_shuffle_block_size(dataset, chunksize, target_bytes=2 ** 28):
+    """
+    Get the number of rows per block for the streaming legacy shuffle.
+
+    Aims at blocks of roughly target_bytes (256 MB by default), but at
+    least one output chunk of rows.
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        The dataset that should be shuffled.
+    chunksize : int
+        The chunksize for axis_0 of the shuffled output.
+    target_bytes : int
+        The desired number of bytes per block.
+
+    Returns
+    -------
+    block_size : int
+        The number of rows per block.
+
+    """
+    row_bytes = int(np.prod(dataset.shape[1:], dtype=np.int64)) * dataset.dtype.itemsize
+    block_size = max(chunksize, target_bytes // max(1, row_bytes))
+    return int(block_size)
+
+
+def read_rows(dataset, sorted_idx):
+    """
+    Read the given rows (ascending indices) from a h5py dataset.
+
+    A fancy read with many indices makes the hdf5 library union one
+    selection per row, which gets expensive for large blocks. When the
+    wanted rows cover most of their bounding range anyway, it is cheaper
+    to read that range with a single contiguous hyperslab selection and
+    gather the rows in memory.
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        The dataset to read from.
+    sorted_idx : ndarray(ndim=1)
+        The wanted rows, in ascending order.
+
+    Returns
+    -------
+    rows : ndarray
+        The rows, in the order of sorted_idx.
+
+    """
+    lo, hi = int(sorted_idx[0]), int(sorted_idx[-1]) + 1
+
+    if len(sorted_idx) >= 0.5 * (hi - lo):
+        slab = dataset[lo:hi]
+        return slab[sorted_idx - lo]
+    else:
+        return dataset[sorted_idx, ...]
 
 
 def get_filepath_output(filepath_input, shuffle, event_skipper):
@@ -141,7 +237,7 @@ def get_filepath_output(filepath_input, shuffle, event_skipper):
 
 def shuffle_h5(filepath_input, tool=False, seed=42, delete=False, chunksize=None,
                complib=None, complevel=None, legacy_mode=False, shuffle=True,
-               event_skipper=None, filepath_output=None):
+               event_skipper=None, filepath_output=None, cache_size=2 ** 28):
     """
     Shuffles a .h5 file where each dataset needs to have the same number of rows (axis_0).
     The shuffled data is saved to a new .h5 file with the suffix < _shuffled.h5 >.
@@ -184,6 +280,11 @@ def shuffle_h5(filepath_input, tool=False, seed=42, delete=False, chunksize=None
     filepath_output : str, optional
         If given, this will be the name of the output file. Otherwise, a name
         is auto generated.
+    cache_size : int
+        Size of the hdf5 raw data chunk cache in bytes that is used for the
+        files in legacy mode. The default of 256 MB keeps the source chunks
+        of one shuffle block cached, so compressed chunks that contribute
+        rows to several reads are not decompressed repeatedly.
 
     Returns
     -------
@@ -227,49 +328,72 @@ def shuffle_h5(filepath_input, tool=False, seed=42, delete=False, chunksize=None
         pipe.attach(kp.io.hdf5.HDF5Sink, filename=filepath_output, complib=complib, complevel=complevel, chunksize=chunksize, flush_frequency=1000)
         pipe.drain()
 
-        # copy the used_files dataset to the new file
-        copy_used_files(filepath_input, filepath_output)
+        # post-process the output with a single open: copy the used_files
+        # dataset to the new file, and delete folders with '_i_' that are
+        # created by pytables in the HDF5Sink, we don't need them
+        output_file_shuffled = h5py.File(filepath_output, 'r+')
+        copy_used_files(filepath_input, output_file_shuffled)
 
         if delete:
             os.remove(filepath_input)
 
-        # delete folders with '_i_' that are created by pytables in the HDF5Sink, we don't need them
-        output_file_shuffled = h5py.File(filepath_output, 'r+')
         for folder_name in output_file_shuffled:
             if folder_name.startswith('_i_'):
                 del output_file_shuffled[folder_name]
 
     else:
-        input_file = h5py.File(filepath_input, 'r')
-        folder_data_array_dict = {}
-
-        for folder_name in input_file:
-            folder_data_array = input_file[folder_name][()]  # get whole numpy array into memory
-            folder_data_array_dict[folder_name] = folder_data_array  # workaround in order to be able to close the input file at the next step
+        # enlarged chunk caches: the default 1 MB cache would evict and
+        # re-decompress source chunks that several block reads touch, and
+        # would flush partially written output chunks early
+        input_file = h5py.File(filepath_input, 'r', rdcc_nbytes=cache_size,
+                               rdcc_nslots=1000003)
+        output_file_shuffled = h5py.File(filepath_output, 'w',
+                                         rdcc_nbytes=cache_size,
+                                         rdcc_nslots=1000003)
+
+        perm = None
+        for dataset_key in input_file:
+            dataset = input_file[dataset_key]
+            n_rows = dataset.shape[0]
+
+            if perm is None:
+                # one permutation, reused for every dataset such that the shuffling is consistent across the datasets
+                perm = make_perm(n_rows, seed)
+
+            if chunksize is not None:
+                chunks = (chunksize,) + dataset.shape[1:]
+            else:
+                # input is not chunked, so derive a chunk shape per dataset
+                chunks = pick_chunks(dataset.shape[1:], dataset.dtype)
 
-        input_file.close()
+            # the byte-shuffle preconditioner improves the gzip ratio on
+            # numeric data considerably; for lzf it rarely pays off
+            dataset_shuffled = output_file_shuffled.create_dataset(
+                dataset_key, shape=dataset.shape, dtype=dataset.dtype, chunks=chunks,
+                compression=complib, compression_opts=complevel,
+                shuffle=(complib == 'gzip'))
 
-        if delete:
-            os.remove(filepath_input)
+            # stream the dataset in blocks instead of loading it into memory as a whole,
+            # so only one block has to fit into memory at a time
+            block_size = get_shuffle_block_size(dataset, chunks[0])
 
-        output_file_shuffled = h5py.File(filepath_output, 'w')
-        for n, dataset_key in enumerate(folder_data_array_dict):
+            for start in range(0, n_rows, block_size):
+                block_perm = perm[start:start + block_size]
 
-            dataset = folder_data_array_dict[dataset_key]
+                # read the block's source rows in ascending order (h5py needs
+                # increasing fancy indices, and sorted reads cluster the I/O),
+                # then restore the shuffled order before writing
+                order = np.argsort(block_perm)
+                block = read_rows(dataset, block_perm[order])
 
-            if n == 0:
-                # get a particular seed for the first dataset such that the shuffling is consistent across the datasets
-                r = np.random.RandomState(seed)
-                state = r.get_state()
-                r.shuffle(dataset)
+                back = np.empty_like(order)
+                back[order] = np.arange(len(order))
+                dataset_shuffled[start:start + block_size] = block[back]
 
-            else:
-                r.set_state(state)  # recover shuffle seed of the first dataset
-                r.shuffle(dataset)
+        input_file.close()
 
-            chunks = (chunksize,) + dataset.shape[1:]
-            output_file_shuffled.create_dataset(dataset_key, data=dataset, dtype=dataset.dtype, chunks=chunks,
-                                                compression=complib, compression_opts=complevel)
+        if delete:
+            os.remove(filepath_input)
 
     # close file in the case of tool=True
     if tool is False:
@@ -282,14 +406,54 @@ def copy_used_files(source_file, target_file):
     """
     Copy the "used_files" dataset from one h5 file to another, if it is present.
 
+    Parameters
+    ----------
+    source_file : str or h5py.File
+        Filepath of the file to copy from, or an already opened handle.
+    target_file : str or h5py.File
+        Filepath of the file to copy to, or an already opened handle.
+        Accepting handles avoids an extra open/close cycle when the
+        target is open anyway (e.g. in shuffle_h5).
+
     """
-    with h5py.File(source_file, "r") as src:
-        if "used_files" in src:
+    opened_here = []
+    if not isinstance(source_file, h5py.File):
+        source_file = h5py.File(source_file, "r")
+        opened_here.append(source_file)
+    if not isinstance(target_file, h5py.File):
+        target_file = h5py.File(target_file, "a")
+        opened_here.append(target_file)
+
+    try:
+        if "used_files" in source_file:
             print("Copying used_files dataset to new file...")
-            used_files = src["used_files"]
+            target_file.create_dataset("used_files",
+                                       data=source_file["used_files"])
+    finally:
+        for f in opened_here:
+            f.close()
 
-            with h5py.File(target_file, "a") as trg:
-                trg.create_dataset("used_files", data=used_files)
+
+def shuffle_file_tool(filepath_input, delete, chunksize, complib, complevel, legacy_mode):
+    """
+    Shuffle one file and print its output info, for the main() tool.
+
+    Module-level so that it can be dispatched to worker processes.
+
+    """
+    print('Shuffling file ' + filepath_input)
+    output_file_shuffled = shuffle_h5(filepath_input, tool=True, seed=42, delete=delete, chunksize=chunksize,
+                                      complib=complib, complevel=complevel, legacy_mode=legacy_mode)
+    print('Finished shuffling. Output information:')
+    print('---------------------------------------')
+    print('The output file contains the following datasets:')
+    for dataset_name in output_file_shuffled:
+        print('Dataset ' + dataset_name + ' with the following shape, dtype and chunks '
+              '(first argument is the chunksize in axis_0): \n' + str(output_file_shuffled[dataset_name].shape)
+              + ' ; ' + str(output_file_shuffled[dataset_name].dtype) + ' ; '
+              + str(output_file_shuffled[dataset_name].chunks))
+
+    output_file_shuffled.close()
 
 
 def main():
@@ -298,23 +462,24 @@ def main():
 
     Shuffles .h5 files where each dataset needs to have the same number of rows (axis_0) for a single file.
     Saves the shuffled data to a new .h5 file.
+    Multiple files can be shuffled in parallel with the --jobs option, with one process per file.
     """
-    input_files_list, delete, chunksize, complib, complevel, legacy_mode = parse_input()
-
-    for filepath_input in input_files_list:
-        print('Shuffling file ' + filepath_input)
-        output_file_shuffled = shuffle_h5(filepath_input, tool=True, seed=42, delete=delete, chunksize=chunksize,
-                                          complib=complib, complevel=complevel, legacy_mode=legacy_mode)
-        print('Finished shuffling. Output information:')
-        print('---------------------------------------')
-        print('The output file contains the following datasets:')
-        for dataset_name in output_file_shuffled:
-            print('Dataset ' + dataset_name + ' with the following shape, dtype and chunks '
-                  '(first argument is the chunksize in axis_0): \n' + str(output_file_shuffled[dataset_name].shape)
-                  + ' ; ' + str(output_file_shuffled[dataset_name].dtype) + ' ; '
-                  + str(output_file_shuffled[dataset_name].chunks))
+    input_files_list, delete, chunksize, complib, complevel, legacy_mode, n_jobs = parse_input()
+
+    if n_jobs != 1 and len(input_files_list) > 1:
+        # one process per file: the per-chunk gzip work of each output is single-threaded,
+        # so shuffling the independent files in parallel scales until the disk saturates
+        max_workers = min(len(input_files_list), n_jobs)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(shuffle_file_tool, filepath_input, delete,
+                                       chunksize, complib, complevel, legacy_mode)
+                       for filepath_input in input_files_list]
+            for future in futures:
+                future.result()  # re-raise errors from the workers
 
-        output_file_shuffled.close()
+    else:
+        for filepath_input in input_files_list:
+            shuffle_file_tool(filepath_input, delete, chunksize, complib, complevel, legacy_mode)
 
 
 if __name__ == '__main__':